@@ -1,4 +1,3 @@
-import copy
 import yaml
 import numpy as np
 import pandas as pd
@@ -6,25 +5,32 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
-from src.engine import run_mc
+from src.engine import run_mc_iter
+from src.metrics import p5
 
 
 # ----------------------------
 # Helpers
 # ----------------------------
+@st.cache_resource
 def load_base_cfg(path: str = "config.yaml") -> dict:
+    # parsed once per process and shared across reruns: treat as read-only
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
 
-def deep_update(d: dict, u: dict) -> dict:
-    """Recursively update dict d with u (in-place)."""
+def deep_merge(d: dict, u: dict) -> dict:
+    """
+    Return d recursively updated with u, without mutating d.
+    Only the dicts along overridden paths are copied; untouched sub-dicts are shared.
+    """
+    out = dict(d)
     for k, v in u.items():
         if isinstance(v, dict) and isinstance(d.get(k), dict):
-            deep_update(d[k], v)
+            out[k] = deep_merge(d[k], v)
         else:
-            d[k] = v
-    return d
+            out[k] = v
+    return out
 
 
 def apply_freeze_switch(cfg: dict, freeze_on: bool) -> dict:
@@ -33,33 +39,45 @@ def apply_freeze_switch(cfg: dict, freeze_on: bool) -> dict:
     - p_freeze_start=0 so freeze never starts
     - p_freeze_persist=0 so freeze can't persist
     """
-    cfg = copy.deepcopy(cfg)
-    cfg.setdefault("funding", {})
     if freeze_on:
         # leave as-is (use config values)
         return cfg
-    cfg["funding"]["p_freeze_start"] = 0.0
-    cfg["funding"]["p_freeze_persist"] = 0.0
-    return cfg
+    return deep_merge(cfg, {"funding": {"p_freeze_start": 0.0, "p_freeze_persist": 0.0}})
 
 
 @st.cache_data(show_spinner=False)
 def run_cached(cfg: dict) -> pd.DataFrame:
     # cfg is hashable by streamlit cache via pickle; keep it a plain dict
-    return run_mc(cfg)
+    # stream engine blocks so long runs show progress instead of a bare spinner
+    n_total = int(cfg["sim"]["N"])
+    prog = st.progress(0.0, text="Simulating paths...")
+    pieces = []
+    for chunk_df in run_mc_iter(cfg):
+        pieces.append(chunk_df)
+        done = int(chunk_df.index[-1]) + 1
+        prog.progress(done / n_total, text=f"Simulated {done:,} / {n_total:,} paths")
+    prog.empty()
+    return pd.concat(pieces)
 
 
 def tail_stats(df: pd.DataFrame, ni_col: str = "total_net_income") -> dict:
-    tail_cut = float(np.percentile(df[ni_col].values, 5))
-    tail = df[df[ni_col] <= tail_cut].copy()
+    ni = df[ni_col].to_numpy()
+    tail_cut = p5(ni)
+    mask = ni <= tail_cut
+    has_tail = bool(mask.any())
+
+    credit = df["credit_loss"].to_numpy()
+    liq = df["liquidity_loss"].to_numpy()
+    liq_pos = liq > 0
 
     stats = {
         "tail_cut": tail_cut,
-        "p_liq_pos_all": float((df["liquidity_loss"] > 0).mean()),
-        "p_liq_pos_tail": float((tail["liquidity_loss"] > 0).mean()) if len(tail) else 0.0,
-        "tail_mean_credit": float(tail["credit_loss"].mean()) if len(tail) else 0.0,
-        "tail_mean_liq": float(tail["liquidity_loss"].mean()) if len(tail) else 0.0,
-        "df_tail": tail,
+        "p_liq_pos_all": float(liq_pos.mean()),
+        "p_liq_pos_tail": float(liq_pos[mask].mean()) if has_tail else 0.0,
+        "tail_mean_credit": float(credit[mask].mean()) if has_tail else 0.0,
+        "tail_mean_liq": float(liq[mask].mean()) if has_tail else 0.0,
+        # row positions only; the tail frame is built when the explorer needs it
+        "tail_idx": np.flatnonzero(mask),
     }
     return stats
 
@@ -138,8 +156,7 @@ cfg_overrides = {
     "funding": {"p_freeze_start": float(p_freeze_start), "p_freeze_persist": float(p_freeze_persist)},
 }
 
-cfg_base = copy.deepcopy(base_cfg)
-deep_update(cfg_base, cfg_overrides)
+cfg_base = deep_merge(base_cfg, cfg_overrides)
 
 # Streamlit reruns on any widget change; we gate heavy compute behind a button
 # but also allow first render to run once automatically
@@ -161,6 +178,7 @@ with st.spinner("Running Monte Carlo..."):
         cfg_on = apply_freeze_switch(cfg_base, True)
         cfg_off = apply_freeze_switch(cfg_base, False)
 
+        # same per-config cache entries as the single modes, so switching modes reuses runs
         df_on = run_cached(cfg_on)
         df_off = run_cached(cfg_off)
 
@@ -285,12 +303,13 @@ with right:
 
     # choose dataset for explorer: prefer ON if comparing
     if freeze_mode == "Compare OFF vs ON":
-        df_exp = s_on["df_tail"].sort_values("total_net_income").reset_index(drop=True)
+        df_src, s = df_on, s_on
         label = "Freeze ON tail"
     else:
+        df_src = df_on if freeze_mode == "ON only" else df_off
         s = s_on if freeze_mode == "ON only" else s_off
-        df_exp = s["df_tail"].sort_values("total_net_income").reset_index(drop=True)
         label = "Tail"
+    df_exp = df_src.iloc[s["tail_idx"]].sort_values("total_net_income").reset_index(drop=True)
 
     if len(df_exp) == 0:
         st.warning("No tail scenarios (unexpected).")
@@ -6,11 +6,16 @@ import pathlib
 
 import yaml
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: no GUI backend probing
 import matplotlib.pyplot as plt
 
 from src.engine import run_mc
+from src.metrics import p5, summarize
 from src.reporting import generate_pdf_report
 
+FIG_DPI = 120
+
 
 def _now_run_id():
     return time.strftime("%Y%m%d_%H%M%S")
@@ -45,24 +50,24 @@ def _make_figures(out_dir: str, df: pd.DataFrame, cfg: dict):
 
     # --- NI distribution ---
     plt.figure()
-    plt.hist(df["total_net_income"], bins=60)
+    plt.hist(df["total_net_income"], bins=60, histtype="stepfilled")
     plt.title("Total Net Income Distribution")
     plt.xlabel("Total Net Income")
     plt.ylabel("Frequency")
     plt.tight_layout()
-    plt.savefig(os.path.join(fig_dir, "ni_distribution.png"), dpi=200)
+    plt.savefig(os.path.join(fig_dir, "ni_distribution.png"), dpi=FIG_DPI)
     plt.close()
 
     # --- Tail NI distribution (worst 5%) ---
-    q05 = df["total_net_income"].quantile(0.05)
+    q05 = p5(df["total_net_income"].to_numpy())
     tail = df[df["total_net_income"] <= q05].copy()
     plt.figure()
-    plt.hist(tail["total_net_income"], bins=40)
+    plt.hist(tail["total_net_income"], bins=40, histtype="stepfilled")
     plt.title("Tail Total Net Income (Worst 5%)")
     plt.xlabel("Total Net Income")
     plt.ylabel("Frequency")
     plt.tight_layout()
-    plt.savefig(os.path.join(fig_dir, "tail_total_net_income.png"), dpi=200)
+    plt.savefig(os.path.join(fig_dir, "tail_total_net_income.png"), dpi=FIG_DPI)
     plt.close()
 
     # --- Equity return distribution ---
@@ -70,12 +75,12 @@ def _make_figures(out_dir: str, df: pd.DataFrame, cfg: dict):
     if eq_cap and eq_cap > 0:
         eq_ret = df["total_net_income"] / eq_cap
         plt.figure()
-        plt.hist(eq_ret, bins=60)
+        plt.hist(eq_ret, bins=60, histtype="stepfilled")
         plt.title("Equity Return Distribution")
         plt.xlabel("Equity Return")
         plt.ylabel("Frequency")
         plt.tight_layout()
-        plt.savefig(os.path.join(fig_dir, "equity_return_distribution.png"), dpi=200)
+        plt.savefig(os.path.join(fig_dir, "equity_return_distribution.png"), dpi=FIG_DPI)
         plt.close()
 
     # --- Sensitivity (correlation bar chart) ---
@@ -90,7 +95,7 @@ def _make_figures(out_dir: str, df: pd.DataFrame, cfg: dict):
         plt.ylabel("Correlation")
         plt.xticks(rotation=30, ha="right")
         plt.tight_layout()
-        plt.savefig(os.path.join(fig_dir, "sensitivity_corr.png"), dpi=200)
+        plt.savefig(os.path.join(fig_dir, "sensitivity_corr.png"), dpi=FIG_DPI)
         plt.close()
 
     # --- Tail decomposition + credit vs liquidity scatter ---
@@ -122,7 +127,7 @@ def _make_figures(out_dir: str, df: pd.DataFrame, cfg: dict):
         plt.xlabel("credit_loss")
         plt.ylabel("liquidity_loss")
         plt.tight_layout()
-        plt.savefig(os.path.join(fig_dir, "credit_vs_liquidity_scatter.png"), dpi=200)
+        plt.savefig(os.path.join(fig_dir, "credit_vs_liquidity_scatter.png"), dpi=FIG_DPI)
         plt.close()
 
 
@@ -135,30 +140,25 @@ def main():
     pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
 
     df = run_mc(cfg)
-    df.to_csv(os.path.join(out_dir, "mc_results.csv"), index=False)
+    df.to_parquet(os.path.join(out_dir, "mc_results.parquet"), compression="zstd", index=False)
     _save_config_snapshot(cfg, out_dir)
 
     _make_figures(out_dir, df, cfg)
 
     # console summary
-    ni = df["total_net_income"]
-    expected = float(ni.mean())
-    p5 = float(ni.quantile(0.05))
-    prob_loss = float((ni < 0).mean())
+    ni = df["total_net_income"].to_numpy()
+    expected, ni_p5, prob_loss = summarize(ni)
 
     eq_cap = _equity_capital(cfg)
     if eq_cap and eq_cap > 0:
-        eq_ret = df["total_net_income"] / eq_cap
-        eq_mean = float(eq_ret.mean())
-        eq_p5 = float(eq_ret.quantile(0.05))
-        prob_eq_loss = float((eq_ret < 0).mean())
+        eq_mean, eq_p5, prob_eq_loss = summarize(ni / eq_cap)
     else:
         eq_mean = eq_p5 = prob_eq_loss = None
 
     print("===== Monte Carlo Summary =====")
     print(f"Run ID: {rid}")
     print(f"Expected Total Net Income: ${expected:,.0f}")
-    print(f"5th Percentile (Worst 5%): ${p5:,.0f}")
+    print(f"5th Percentile (Worst 5%): ${ni_p5:,.0f}")
     print(f"Probability of Loss: {prob_loss*100:.2f}%")
     if eq_mean is not None:
         print(f"Equity Return (mean): {eq_mean*100:.2f}%")
@@ -166,7 +166,7 @@ def main():
         print(f"Probability of Equity Loss: {prob_eq_loss*100:.2f}%")
     print(f"Saved outputs to: {out_dir}")
 
-    pdf_path = generate_pdf_report(out_dir, cfg)
+    pdf_path = generate_pdf_report(out_dir, cfg, df=df)
     print("PDF report generated:", pdf_path)
     print("Figures saved to:", os.path.join(out_dir, "figures"))
 
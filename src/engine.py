@@ -1,125 +1,272 @@
 
 # ===== REFINANCE CLIFF (LIQUIDITY-TAIL ENHANCED) =====
 
+import math
+from typing import NamedTuple
+
 import numpy as np
 import pandas as pd
 
+# paths per simulation block: ~8 state arrays x 4096 paths stay well inside L2
+CHUNK_SIZE = 4096
 
-def _sample_systemic(rng):
-    # one-factor systemic driver
-    return float(rng.normal())
+# per-path shocks, rates and uniforms are float32 (tail estimates are limited by
+# 1/sqrt(N) sampling error, not by ~1e-7 relative rounding); money stays float64
+STATE_DTYPE = np.float32
 
+# result columns and their stored dtype: money columns stay float64, the sampled
+# driver/parameter columns are kept at STATE_DTYPE (half the memory and file size)
+RESULT_DTYPES = {
+    "total_net_income": np.float64,
+    "credit_loss": np.float64,
+    "liquidity_loss": np.float64,
+    "Z_sys": STATE_DTYPE,
+    "default_rate": STATE_DTYPE,
+    "lgd": STATE_DTYPE,
+    "margin_shock": STATE_DTYPE,
+}
+RESULT_COLUMNS = tuple(RESULT_DTYPES)
 
-def _sample_params(rng, cfg, Z):
-    re = cfg["risk_engine"]
 
-    e1, e2, e3 = rng.normal(size=3)
+def _draw_block(rng, n):
+    """
+    Every random input for a block of n paths, drawn up front in a few bulk calls.
+    All of them are drawn whatever the config (e.g. Freeze OFF), so runs that
+    share a seed share every path's randomness.
+    """
+    return {
+        "Z": rng.standard_normal(n, dtype=STATE_DTYPE),           # one-factor systemic driver
+        "E": rng.standard_normal((n, 3), dtype=STATE_DTYPE),      # idiosyncratic default/lgd/margin shocks
+        "u_freeze": rng.random(n, dtype=STATE_DTYPE),
+        "u_default": rng.random(n, dtype=STATE_DTYPE),
+        "hair_z": rng.standard_normal(n, dtype=STATE_DTYPE),
+        "u_fail": rng.random(n, dtype=STATE_DTYPE),
+    }
+
 
-    z_default = np.sqrt(re["rho_default"]) * Z + np.sqrt(1 - re["rho_default"]) * e1
-    z_lgd = np.sqrt(re["rho_lgd"]) * Z + np.sqrt(1 - re["rho_lgd"]) * e2
-    z_margin = np.sqrt(re["rho_margin"]) * Z + np.sqrt(1 - re["rho_margin"]) * e3
+def _shock_clip(spec, z):
+    # base + coef * z, clipped; computed in one buffer instead of
+    # separate temporaries for the multiply, the add and the clip
+    v = z * spec.coef
+    v += spec.base
+    return np.clip(v, spec.clip_min, spec.clip_max, out=v)
 
-    default_rate = re["default_rate"]["base"] + re["default_rate"]["shock_coef"] * (-z_default)
-    default_rate = float(np.clip(default_rate,
-                                 re["default_rate"]["clip_min"],
-                                 re["default_rate"]["clip_max"]))
 
-    lgd = re["lgd"]["base"] + re["lgd"]["shock_coef"] * (-z_lgd)
-    lgd = float(np.clip(lgd,
-                        re["lgd"]["clip_min"],
-                        re["lgd"]["clip_max"]))
+def _sample_params(p, Z, E):
+    z_default = p.sqrt_rho_default * Z + p.sqrt_1m_rho_default * E[:, 0]
+    z_lgd = p.sqrt_rho_lgd * Z + p.sqrt_1m_rho_lgd * E[:, 1]
+    z_margin = p.sqrt_rho_margin * Z + p.sqrt_1m_rho_margin * E[:, 2]
 
-    margin_shock = re["margin_shock"]["shock_coef"] * z_margin
-    margin_shock = float(np.clip(margin_shock,
-                                 re["margin_shock"]["clip_min"],
-                                 re["margin_shock"]["clip_max"]))
+    default_rate = _shock_clip(p.default_rate_spec, z_default)
+    lgd = _shock_clip(p.lgd_spec, z_lgd)
+    margin_shock = _shock_clip(p.margin_spec, z_margin)
 
     return default_rate, lgd, margin_shock
 
 
-def _simulate_one_path(cfg, Z, default_rate, lgd, margin_shock, rng):
-    H = int(cfg["sim"]["H"])
-    notional = float(cfg["portfolio"]["notional"])
-    funding_cfg = cfg.get("funding", {})
+def _p_freeze_terminal(p_start, p_persist, H):
+    """
+    P(in freeze after H monthly steps) for the two-state Markov regime, starting
+    unfrozen: pi * (1 - lam**H) with pi = a / (a + b), lam = 1 - a - b,
+    a = p_start, b = 1 - p_persist.
+    """
+    a = p_start
+    b = 1.0 - p_persist
+    if a + b <= 0.0:
+        # never enters the freeze regime (a = 0) and never leaves it
+        return 0.0
+    return a / (a + b) * (1.0 - (1.0 - a - b) ** H)
 
-    coupon = float(cfg["portfolio"]["annual_coupon_rate"]) + float(margin_shock)
-    coupon_m = coupon / 12.0
 
-    # freeze regime
-    p_freeze_start = float(funding_cfg.get("p_freeze_start", 0.06))
-    p_freeze_persist = float(funding_cfg.get("p_freeze_persist", 0.70))
+class ShockSpec(NamedTuple):
+    """Linear shock mapping base + coef * z, clipped to [clip_min, clip_max]."""
+    base: float
+    coef: float            # shock_coef with the direction sign folded in
+    clip_min: float
+    clip_max: float
+
+
+def _shock_spec(spec, sign):
+    return ShockSpec(
+        base=float(spec.get("base", 0.0)),
+        coef=sign * float(spec["shock_coef"]),
+        clip_min=float(spec["clip_min"]),
+        clip_max=float(spec["clip_max"]),
+    )
+
+
+class SimParams(NamedTuple):
+    """Everything the path simulation needs, read and coerced from cfg once per run."""
+    H: int
+    notional: float
+    annual_coupon_rate: float
+
+    # one-factor loadings sqrt(rho) on Z and sqrt(1 - rho) on the idiosyncratic shock
+    sqrt_rho_default: float
+    sqrt_1m_rho_default: float
+    sqrt_rho_lgd: float
+    sqrt_1m_rho_lgd: float
+    sqrt_rho_margin: float
+    sqrt_1m_rho_margin: float
+
+    # linear shock mappings; default_rate and lgd rise as Z falls, margin_shock rises with Z
+    default_rate_spec: ShockSpec
+    lgd_spec: ShockSpec
+    margin_spec: ShockSpec
+
+    # freeze regime: only the state at maturity affects the payoff
+    p_freeze_terminal: float
 
     # refinance cliff parameters (tail-enhanced)
-    base_fail = float(funding_cfg.get("refinance_fail_prob", 0.50))
-    fail_sens = float(funding_cfg.get("refinance_fail_sens", 0.35))   # higher => more likely to fail when Z is bad
+    base_fail: float
+    fail_sens: float       # higher => more likely to fail when Z is bad
 
-    base_haircut = float(funding_cfg.get("forced_sale_haircut", 0.30))
-    hair_sens = float(funding_cfg.get("haircut_sens", 0.25))          # higher => deeper haircut when Z is bad
-    hair_noise = float(funding_cfg.get("haircut_noise", 0.10))        # idiosyncratic dispersion
-    hair_min = float(funding_cfg.get("haircut_min", 0.10))
-    hair_max = float(funding_cfg.get("haircut_max", 0.70))
+    base_haircut: float
+    hair_sens: float       # higher => deeper haircut when Z is bad
+    hair_noise: float      # idiosyncratic dispersion
+    hair_min: float
+    hair_max: float
 
-    # bullet term default probability
-    term_years = H / 12.0
-    p_default_term = 1.0 - (1.0 - np.clip(default_rate, 0.0, 1.0)) ** term_years
-    p_default_term = float(np.clip(p_default_term, 0.0, 1.0))
 
-    total_income = 0.0
-    credit_loss = 0.0
-    liquidity_loss = 0.0
+def _unpack_cfg(cfg):
+    funding_cfg = cfg.get("funding", {})
+    re = cfg["risk_engine"]
+    H = int(cfg["sim"]["H"])
+    return SimParams(
+        H=H,
+        notional=float(cfg["portfolio"]["notional"]),
+        annual_coupon_rate=float(cfg["portfolio"]["annual_coupon_rate"]),
+        sqrt_rho_default=math.sqrt(re["rho_default"]),
+        sqrt_1m_rho_default=math.sqrt(1 - re["rho_default"]),
+        sqrt_rho_lgd=math.sqrt(re["rho_lgd"]),
+        sqrt_1m_rho_lgd=math.sqrt(1 - re["rho_lgd"]),
+        sqrt_rho_margin=math.sqrt(re["rho_margin"]),
+        sqrt_1m_rho_margin=math.sqrt(1 - re["rho_margin"]),
+        default_rate_spec=_shock_spec(re["default_rate"], -1.0),
+        lgd_spec=_shock_spec(re["lgd"], -1.0),
+        margin_spec=_shock_spec(re["margin_shock"], 1.0),
+        p_freeze_terminal=_p_freeze_terminal(
+            float(funding_cfg.get("p_freeze_start", 0.06)),
+            float(funding_cfg.get("p_freeze_persist", 0.70)),
+            H,
+        ),
+        base_fail=float(funding_cfg.get("refinance_fail_prob", 0.50)),
+        fail_sens=float(funding_cfg.get("refinance_fail_sens", 0.35)),
+        base_haircut=float(funding_cfg.get("forced_sale_haircut", 0.30)),
+        hair_sens=float(funding_cfg.get("haircut_sens", 0.25)),
+        hair_noise=float(funding_cfg.get("haircut_noise", 0.10)),
+        hair_min=float(funding_cfg.get("haircut_min", 0.10)),
+        hair_max=float(funding_cfg.get("haircut_max", 0.70)),
+    )
+
 
-    in_freeze = False
-    outstanding = notional
+def _simulate_paths(p, draws, default_rate, lgd, margin_shock):
+    """Simulate all paths at once; every per-path quantity is an array of shape (n,)."""
+    Z = draws["Z"]
+    n = Z.shape[0]
+    H = p.H
+    notional = p.notional
 
-    for t in range(H):
-        # freeze state (Markov)
-        if in_freeze:
-            in_freeze = (rng.random() < p_freeze_persist)
-        else:
-            in_freeze = (rng.random() < p_freeze_start)
+    coupon = p.annual_coupon_rate + margin_shock.astype(np.float64)
+    coupon_m = coupon / 12.0
+
+    # bullet term default probability: 1 - (1 - dr)**term_years, in one buffer
+    term_years = H / 12.0
+    p_default_term = np.clip(default_rate, 0.0, 1.0)
+    np.subtract(1.0, p_default_term, out=p_default_term)
+    p_default_term **= term_years
+    np.subtract(1.0, p_default_term, out=p_default_term)
+    np.clip(p_default_term, 0.0, 1.0, out=p_default_term)
 
-        # interest until maturity
-        total_income += outstanding * coupon_m
+    # bullet structure: outstanding stays at notional until maturity,
+    # so H months of interest collapse to a single product
+    total_income = notional * coupon_m * H
 
-        if t == H - 1:
-            # credit default at maturity
-            D = 1.0 if (rng.random() < p_default_term) else 0.0
-            credit_loss = notional * D * lgd
+    # freeze state at maturity, sampled from the Markov chain's H-step marginal
+    # (one uniform per path instead of H)
+    in_freeze = draws["u_freeze"] < p.p_freeze_terminal
 
-            # refinance failure only matters in freeze regime
-            if in_freeze:
-                # make fail probability stress-dependent (bad Z -> higher fail probability)
-                p_fail = base_fail + fail_sens * max(-Z, 0.0)
-                p_fail = float(np.clip(p_fail, 0.0, 0.995))
+    # credit default at maturity
+    D = draws["u_default"] < p_default_term
+    credit_loss = notional * D * lgd.astype(np.float64)
 
-                # haircut becomes stress-dependent + noisy (tail fattening)
-                hc = base_haircut + hair_sens * max(-Z, 0.0) + hair_noise * float(rng.normal())
-                hc = float(np.clip(hc, hair_min, hair_max))
+    # refinance failure only matters in freeze regime: the liquidity math runs on
+    # frozen paths only, and is skipped when none are frozen (always with Freeze OFF)
+    liquidity_loss = np.zeros(n)
+    frozen = np.flatnonzero(in_freeze)
+    if frozen.size:
+        # max(-Z, 0) on the gathered copy, in place
+        stress = np.negative(Z[frozen])
+        np.maximum(stress, 0.0, out=stress)
 
-                if rng.random() < p_fail:
-                    forced_value = notional * (1.0 - hc)
-                    liquidity_loss = notional - forced_value
+        # make fail probability stress-dependent (bad Z -> higher fail probability)
+        p_fail = p.fail_sens * stress
+        p_fail += p.base_fail
+        np.clip(p_fail, 0.0, 0.995, out=p_fail)
 
-            total_income -= (credit_loss + liquidity_loss)
-            outstanding = 0.0
+        # haircut becomes stress-dependent + noisy (tail fattening)
+        hc = p.hair_sens * stress
+        hc += p.base_haircut
+        hc += p.hair_noise * draws["hair_z"][frozen]
+        np.clip(hc, p.hair_min, p.hair_max, out=hc)
+
+        failed = draws["u_fail"][frozen] < p_fail
+        forced_value = notional * (1.0 - hc.astype(np.float64))
+        liquidity_loss[frozen] = np.where(failed, notional - forced_value, 0.0)
+
+    total_income -= (credit_loss + liquidity_loss)
 
     return {
-        "total_net_income": float(total_income),
-        "credit_loss": float(credit_loss),
-        "liquidity_loss": float(liquidity_loss),
-        "Z_sys": float(Z),
-        "default_rate": float(default_rate),
-        "lgd": float(lgd),
-        "margin_shock": float(margin_shock),
+        "total_net_income": total_income,
+        "credit_loss": credit_loss,
+        "liquidity_loss": liquidity_loss,
+        "Z_sys": Z,
+        "default_rate": default_rate,
+        "lgd": lgd,
+        "margin_shock": margin_shock,
     }
 
 
+def _simulate_chunk(rng, p, n):
+    draws = _draw_block(rng, n)
+    dr, lg, ms = _sample_params(p, draws["Z"], draws["E"])
+    return _simulate_paths(p, draws, dr, lg, ms)
+
+
+def _iter_blocks(cfg):
+    N = int(cfg["sim"]["N"])
+    chunk_size = int(cfg["sim"].get("chunk_size", CHUNK_SIZE))
+    p = _unpack_cfg(cfg)
+
+    # paths are simulated in blocks so the per-path state arrays stay cache-resident;
+    # every block gets its own child stream, so results depend only on seed and
+    # chunk_size, and any block can be regenerated on its own
+    starts = range(0, N, chunk_size)
+    seeds = np.random.SeedSequence(cfg["seed"]).spawn(len(starts))
+
+    for start, seed in zip(starts, seeds):
+        stop = min(start + chunk_size, N)
+        yield start, stop, _simulate_chunk(np.random.default_rng(seed), p, stop - start)
+
+
+def run_mc_iter(cfg):
+    """
+    Yield the simulation block by block as DataFrames (row index continues across
+    blocks), so callers can show progress. Concatenated, the blocks equal run_mc(cfg).
+    """
+    for start, stop, res in _iter_blocks(cfg):
+        cols = {col: res[col].astype(dt, copy=False) for col, dt in RESULT_DTYPES.items()}
+        yield pd.DataFrame(cols, index=pd.RangeIndex(start, stop), copy=False)
+
+
 def run_mc(cfg):
-    rng = np.random.default_rng(cfg["seed"])
     N = int(cfg["sim"]["N"])
-    out = []
-    for _ in range(N):
-        Z = _sample_systemic(rng)
-        dr, lg, ms = _sample_params(rng, cfg, Z)
-        out.append(_simulate_one_path(cfg, Z, dr, lg, ms, rng))
-    return pd.DataFrame(out)
+
+    # each block is written straight into preallocated columns (peak = result + one block)
+    out = {col: np.empty(N, dtype=dt) for col, dt in RESULT_DTYPES.items()}
+    for start, stop, res in _iter_blocks(cfg):
+        for col in RESULT_COLUMNS:
+            out[col][start:stop] = res[col]
+
+    # column arrays are freshly allocated per run, so pandas can adopt them as-is
+    return pd.DataFrame(out, copy=False)
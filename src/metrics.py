@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def p5(x):
+    """
+    5th percentile with linear interpolation (same value as np.percentile(x, 5),
+    including nan when x contains NaN), selecting only the two bracketing order
+    statistics with np.partition.
+    """
+    x = np.asarray(x, dtype=float)
+    if x.size == 0:
+        raise ValueError("p5 of an empty array is undefined")
+    # np.partition sorts NaN to the end, which would yield a finite, wrong value
+    if np.isnan(x).any():
+        return float("nan")
+    pos = (x.size - 1) * 0.05
+    lo = int(pos)
+    hi = min(lo + 1, x.size - 1)
+    part = np.partition(x, [lo, hi])
+    return float(part[lo] + (part[hi] - part[lo]) * (pos - lo))
+
+
+def summarize(x):
+    """Return (mean, 5th percentile, probability of loss) for a net income array."""
+    x = np.asarray(x, dtype=float)
+    return float(x.mean()), p5(x), float((x < 0).mean())
@@ -3,24 +3,15 @@ import json
 import numpy as np
 import pandas as pd
 
-
-def _safe_float(x):
-    try:
-        if x is None:
-            return np.nan
-        if isinstance(x, str):
-            x = x.replace(",", "").replace("$", "").strip()
-        return float(x)
-    except Exception:
-        return np.nan
+from src.metrics import summarize
 
 
 def _compute_python_kpis(df_mc: pd.DataFrame):
-    x = df_mc["total_net_income"].to_numpy()
+    mean, p5, prob_loss = summarize(df_mc["total_net_income"].to_numpy())
     return {
-        "expected_total_net_income": float(np.mean(x)),
-        "p5_total_net_income": float(np.percentile(x, 5)),
-        "probability_of_loss": float(np.mean(x < 0)),
+        "expected_total_net_income": mean,
+        "p5_total_net_income": p5,
+        "probability_of_loss": prob_loss,
     }
 
 
@@ -36,16 +27,19 @@ def _read_excel_kpis(excel_kpi_path: str):
     if "kpi" not in df.columns or "value" not in df.columns:
         raise ValueError("Excel KPI CSV must have columns: kpi, value")
 
-    out = {}
-    for _, r in df.iterrows():
-        k = str(r["kpi"]).strip()
-        v = _safe_float(r["value"])
-        out[k] = v
-    return out
+    v = (df["value"].astype(str)
+         .str.replace(",", "", regex=False)
+         .str.replace("$", "", regex=False)
+         .str.strip())
+    values = pd.to_numeric(v, errors="coerce").astype(float)
+    return dict(zip(df["kpi"].astype(str).str.strip(), values))
 
 
 def reconcile_kpis(excel_kpi_path: str, mc_results_path: str, out_dir: str):
-    df_mc = pd.read_csv(mc_results_path)
+    if mc_results_path.lower().endswith(".parquet"):
+        df_mc = pd.read_parquet(mc_results_path)
+    else:
+        df_mc = pd.read_csv(mc_results_path)
 
     py = _compute_python_kpis(df_mc)
     xl = _read_excel_kpis(excel_kpi_path)
@@ -24,26 +24,27 @@ def layer_reconcile(excel_layers_csv: str, python_layer_trace_csv: str, out_dir:
     id_cols = {"month", "sim"}
     common = [c for c in xl.columns if c in py.columns and c not in id_cols]
 
-    rows = []
     merged = xl.merge(py, on="month", how="outer", suffixes=("_excel", "_python"))
 
-    for m in common:
-        a = merged[f"{m}_excel"].astype(float)
-        b = merged[f"{m}_python"].astype(float)
+    if common:
+        # (months, metrics) blocks; transposed ravel keeps rows grouped by metric
+        a = merged[[f"{m}_excel" for m in common]].to_numpy(dtype=float)
+        b = merged[[f"{m}_python" for m in common]].to_numpy(dtype=float)
         diff = b - a
-        diff_pct = np.where(a != 0, diff / a, np.nan)
-
-        tmp = pd.DataFrame({
-            "month": merged["month"],
-            "metric": m,
-            "excel_value": a,
-            "python_value": b,
-            "diff": diff,
-            "diff_pct": diff_pct,
+        # divide only where the Excel value is non-zero; other cells stay NaN
+        diff_pct = np.divide(diff, a, out=np.full(a.shape, np.nan), where=(a != 0))
+
+        out = pd.DataFrame({
+            "month": np.tile(merged["month"].to_numpy(), len(common)),
+            "metric": np.repeat(common, len(merged)),
+            "excel_value": a.T.ravel(),
+            "python_value": b.T.ravel(),
+            "diff": diff.T.ravel(),
+            "diff_pct": diff_pct.T.ravel(),
         })
-        rows.append(tmp)
+    else:
+        out = pd.DataFrame()
 
-    out = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
     os.makedirs(out_dir, exist_ok=True)
     out_path = os.path.join(out_dir, "recon_layers.csv")
     out.to_csv(out_path, index=False)
@@ -1,9 +1,11 @@
 import os
 import json
 import glob
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+
+from src.metrics import summarize
+from src.reporting import build_canvas_pdf, read_mc_results
 
 
 def _fmt_money(x):
@@ -20,44 +22,36 @@ def _fmt_pct(x):
         return str(x)
 
 
-def build_pdf(run_dir: str, pdf_name: str = "report.pdf") -> str:
+def build_pdf(run_dir: str, pdf_name: str = "report.pdf", df: pd.DataFrame | None = None, cfg: dict | None = None) -> str:
     """
     Build a single PDF report from outputs/<run_id>/:
-      - mc_results.csv
-      - config_snapshot.json (optional)
+      - mc_results.parquet, or mc_results.csv for older runs (skipped when df is passed in)
+      - config_snapshot.json (optional; skipped when cfg is passed in)
       - figures/*.png (optional)
     """
     run_dir = os.path.abspath(run_dir)
-    csv_path = os.path.join(run_dir, "mc_results.csv")
     cfg_path = os.path.join(run_dir, "config_snapshot.json")
     figs_dir = os.path.join(run_dir, "figures")
     pdf_path = os.path.join(run_dir, pdf_name)
 
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Missing {csv_path}")
-
-    df = pd.read_csv(csv_path)
+    if df is None:
+        df = read_mc_results(run_dir)
 
-    cfg = {}
-    if os.path.exists(cfg_path):
-        with open(cfg_path, "r") as f:
-            cfg = json.load(f)
+    if cfg is None:
+        cfg = {}
+        if os.path.exists(cfg_path):
+            with open(cfg_path, "r") as f:
+                cfg = json.load(f)
 
     # --- summary metrics ---
+    # columns come from our own writer (already float), so no to_numeric re-parse
     income_col = "total_net_income" if "total_net_income" in df.columns else df.columns[0]
-    income = pd.to_numeric(df[income_col], errors="coerce")
-
-    mean_income = float(income.mean())
-    p5_income = float(income.quantile(0.05))
-    loss_prob = float((income < 0).mean())
+    mean_income, p5_income, loss_prob = summarize(df[income_col].to_numpy())
 
     # Equity metrics (if present)
     equity_lines = []
     if "equity_return" in df.columns:
-        eq = pd.to_numeric(df["equity_return"], errors="coerce")
-        eq_mean = float(eq.mean())
-        eq_p5 = float(eq.quantile(0.05))
-        eq_loss_prob = float((eq < 0).mean())
+        eq_mean, eq_p5, eq_loss_prob = summarize(df["equity_return"].to_numpy())
         equity_lines = [
             "",
             "Equity Return Metrics",
@@ -71,78 +65,61 @@ def build_pdf(run_dir: str, pdf_name: str = "report.pdf") -> str:
     tranche_cols = [c for c in ["WH_loss", "A_loss", "B_loss", "C_loss"] if c in df.columns]
     tranche_lines = []
     for c in tranche_cols:
-        p = float((pd.to_numeric(df[c], errors="coerce") > 0).mean())
+        p = float(np.mean(df[c].to_numpy() > 0))
         tranche_lines.append(f"{c}: P(loss>0) = {p:.2%}")
 
-    # --- build PDF ---
-    with PdfPages(pdf_path) as pdf:
-        # Page 1: text summary
-        fig = plt.figure(figsize=(8.27, 11.69))  # A4 portrait
-        fig.suptitle("Monte Carlo Risk Report", fontsize=18, y=0.98)
-
-        run_id = os.path.basename(run_dir.rstrip("/"))
-        lines = [
-            f"Run ID: {run_id}",
-            "",
-            "Key Metrics",
-            f"- Expected Total Net Income: {_fmt_money(mean_income)}",
-            f"- 5th Percentile (Worst 5%): {_fmt_money(p5_income)}",
-            f"- Probability of Loss: {loss_prob:.2%}",
-        ]
-
-        # Add equity summary right after key metrics
-        if equity_lines:
-            lines += equity_lines
-
-        if tranche_lines:
-            lines += ["Tranche Loss Probabilities"] + [f"- {t}" for t in tranche_lines] + [""]
-
-        # config snapshot
-        if cfg:
-            lines += ["Config Snapshot (selected)"]
-
-            # try common schemas first; fall back to first few keys
-            pick_keys = []
-            for k in [
-                "seed",
-                "sim",
-                "portfolio",
-                "funding",
-                "opex",
-                "risk_engine",
-                "n_sims",
-                "horizon_months",
-                "portfolio_notional",
-                "coupon_annual",
-            ]:
-                if k in cfg:
-                    pick_keys.append(k)
-
-            if not pick_keys:
-                pick_keys = list(cfg.keys())[:8]
-
-            for k in pick_keys:
-                v = cfg.get(k)
-                vv = json.dumps(v) if isinstance(v, (dict, list)) else str(v)
-                if len(vv) > 160:
-                    vv = vv[:160] + "..."
-                lines.append(f"- {k}: {vv}")
-
-        fig.text(0.08, 0.92, "\n".join(lines), va="top", fontsize=11)
-        plt.axis("off")
-        pdf.savefig(fig)
-        plt.close(fig)
-
-        # Pages: embed saved PNG figures (if any)
-        pngs = sorted(glob.glob(os.path.join(figs_dir, "*.png")))
-        for p in pngs:
-            img = plt.imread(p)
-            fig = plt.figure(figsize=(11.69, 8.27))  # A4 landscape
-            ax = fig.add_axes([0, 0, 1, 1])
-            ax.imshow(img)
-            ax.axis("off")
-            pdf.savefig(fig)
-            plt.close(fig)
+    # --- summary page lines ---
+    run_id = os.path.basename(run_dir.rstrip("/"))
+    lines = [
+        f"Run ID: {run_id}",
+        "",
+        "Key Metrics",
+        f"- Expected Total Net Income: {_fmt_money(mean_income)}",
+        f"- 5th Percentile (Worst 5%): {_fmt_money(p5_income)}",
+        f"- Probability of Loss: {loss_prob:.2%}",
+    ]
+
+    # Add equity summary right after key metrics
+    if equity_lines:
+        lines += equity_lines
+
+    if tranche_lines:
+        lines += ["Tranche Loss Probabilities"] + [f"- {t}" for t in tranche_lines] + [""]
+
+    # config snapshot
+    if cfg:
+        lines += ["Config Snapshot (selected)"]
+
+        # try common schemas first; fall back to first few keys
+        pick_keys = []
+        for k in [
+            "seed",
+            "sim",
+            "portfolio",
+            "funding",
+            "opex",
+            "risk_engine",
+            "n_sims",
+            "horizon_months",
+            "portfolio_notional",
+            "coupon_annual",
+        ]:
+            if k in cfg:
+                pick_keys.append(k)
+
+        if not pick_keys:
+            pick_keys = list(cfg.keys())[:8]
+
+        for k in pick_keys:
+            v = cfg.get(k)
+            vv = json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+            if len(vv) > 160:
+                vv = vv[:160] + "..."
+            lines.append(f"- {k}: {vv}")
+
+    # reportlab embeds each PNG as-is (no decode + re-rasterize through imshow)
+    pngs = sorted(glob.glob(os.path.join(figs_dir, "*.png")))
+    build_canvas_pdf(pdf_path, title="Monte Carlo Risk Report", fig_paths=pngs, summary_lines=lines)
 
     return pdf_path
 
@@ -3,7 +3,9 @@ import os
 import json
 import pandas as pd
 
-from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.pagesizes import LETTER, letter, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
@@ -29,6 +31,14 @@ def _safe_read_csv(path):
         pass
     return None
 
+def read_mc_results(output_dir):
+    # parquet is the primary format; CSV kept for runs written before the switch
+    for name, reader in [("mc_results.parquet", pd.read_parquet), ("mc_results.csv", pd.read_csv)]:
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            return reader(path)
+    raise FileNotFoundError(f"Missing {os.path.join(output_dir, 'mc_results.parquet')}")
+
 def _scaled_image(path, max_w, max_h):
     if not os.path.exists(path):
         return None
@@ -45,12 +55,60 @@ def _scaled_image(path, max_w, max_h):
         return None
 
 
-def generate_pdf_report(output_dir: str, cfg: dict | None = None) -> str:
-    mc_path = os.path.join(output_dir, "mc_results.csv")
-    if not os.path.exists(mc_path):
-        raise FileNotFoundError(f"Missing {mc_path}")
+def build_canvas_pdf(pdf_path, title, fig_paths, summary_lines=None):
+    # plain canvas layout: summary text, then one PNG per page embedded as-is via ImageReader
+    c = canvas.Canvas(pdf_path, pagesize=LETTER)
+    W, H = LETTER
+
+    # ---------------- Cover / Summary page ----------------
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(72, H - 80, title)
+
+    c.setFont("Helvetica", 11)
+    c.drawString(72, H - 105, f"Generated: {pd.Timestamp.now()}")
+
+    if summary_lines:
+        y = H - 140
+        line_h = 14
+        c.setFont("Helvetica", 11)
+        for line in summary_lines:
+            # basic page break if needed
+            if y < 72:
+                c.showPage()
+                y = H - 72
+                c.setFont("Helvetica", 11)
+            c.drawString(72, y, str(line))
+            y -= line_h
+
+    c.showPage()
+
+    # ---------------- One image per page ----------------
+    for p in fig_paths:
+        if not os.path.exists(p):
+            continue
+
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(72, H - 60, os.path.basename(p))
+
+        img = ImageReader(p)
+        x0, y0 = 72, 72
+        max_w, max_h = W - 144, H - 144
+
+        iw, ih = img.getSize()
+        scale = min(max_w / iw, max_h / ih)
+        w = iw * scale
+        h = ih * scale
+
+        c.drawImage(img, x0, y0, width=w, height=h, preserveAspectRatio=True, anchor="sw")
+        c.showPage()
+
+    c.save()
+
 
-    df = pd.read_csv(mc_path)
+def generate_pdf_report(output_dir: str, cfg: dict | None = None, df: pd.DataFrame | None = None) -> str:
+    # callers that still hold the results frame pass it in to skip the re-read
+    if df is None:
+        df = read_mc_results(output_dir)
 
     if cfg is None:
         snap = os.path.join(output_dir, "config_snapshot.json")
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import yaml
+
+from src.engine import _draw_block, _simulate_paths, _unpack_cfg
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config.yaml")
+
+
+def _load_cfg():
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+
+def test_bullet_income_matches_month_loop():
+    cfg = _load_cfg()
+    # no freeze and no defaults, so net income is the interest leg alone
+    p = _unpack_cfg(cfg)._replace(p_freeze_terminal=0.0)
+    n = 1000
+    draws = _draw_block(np.random.default_rng(0), n)
+    draws["u_default"] = np.ones(n, dtype=draws["u_default"].dtype)
+    margin_shock = draws["E"][:, 2] * np.float32(0.01)
+    default_rate = np.full(n, 0.02, dtype=np.float32)
+    lgd = np.full(n, 0.4, dtype=np.float32)
+
+    res = _simulate_paths(p, draws, default_rate, lgd, margin_shock)
+
+    coupon_m = (p.annual_coupon_rate + margin_shock.astype(np.float64)) / 12.0
+    expected = np.zeros(n)
+    outstanding = p.notional
+    for _ in range(p.H):
+        expected += outstanding * coupon_m
+
+    np.testing.assert_allclose(res["total_net_income"], expected, rtol=1e-12)
+    assert not res["credit_loss"].any()
+    assert not res["liquidity_loss"].any()
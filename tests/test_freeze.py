@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.engine import _p_freeze_terminal
+
+
+def _freeze_chain_marginal(p_start, p_persist, H):
+    # the original month loop: start unfrozen, step the two-state chain H times
+    q = 0.0
+    for _ in range(H):
+        q = q * p_persist + (1.0 - q) * p_start
+    return q
+
+
+@pytest.mark.parametrize(
+    "p_start, p_persist, H",
+    [
+        (0.06, 0.70, 60),   # config defaults
+        (0.06, 0.70, 1),
+        (0.30, 0.95, 12),
+        (0.10, 0.00, 24),   # p_persist = 0: freeze never lasts past one month
+        (0.00, 1.00, 60),   # a + b = 0: never enters the freeze regime
+        (1.00, 1.00, 5),    # absorbing after the first month
+    ],
+)
+def test_p_freeze_terminal_matches_markov_chain(p_start, p_persist, H):
+    expected = _freeze_chain_marginal(p_start, p_persist, H)
+    assert _p_freeze_terminal(p_start, p_persist, H) == pytest.approx(expected, rel=1e-12, abs=1e-15)
+
+
+def test_p_freeze_terminal_matches_sampled_chain():
+    p_start, p_persist, H, n = 0.06, 0.70, 60, 200_000
+    rng = np.random.default_rng(7)
+    in_freeze = np.zeros(n, dtype=bool)
+    for _ in range(H):
+        u = rng.random(n)
+        in_freeze = np.where(in_freeze, u < p_persist, u < p_start)
+
+    p = _p_freeze_terminal(p_start, p_persist, H)
+    se = np.sqrt(p * (1.0 - p) / n)
+    assert abs(in_freeze.mean() - p) < 5.0 * se
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from src.metrics import p5, summarize
+
+
+@pytest.mark.parametrize("n", [1, 2, 19, 20, 21, 1000])
+def test_p5_matches_np_percentile(n):
+    x = np.random.default_rng(n).standard_normal(n)
+    assert p5(x) == pytest.approx(np.percentile(x, 5), rel=1e-12, abs=1e-15)
+
+
+def test_p5_propagates_nan():
+    x = np.array([1.0, np.nan, 3.0])
+    assert np.isnan(np.percentile(x, 5))
+    assert np.isnan(p5(x))
+    mean, q05, _ = summarize(x)
+    assert np.isnan(mean) and np.isnan(q05)
+
+
+def test_p5_empty_raises():
+    with pytest.raises(ValueError, match="empty"):
+        p5(np.array([]))